@@ -1,17 +1,136 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request
 from datetime import datetime
+from collections import deque
+from itertools import islice
 import json
 import os
+import orjson
+import queue
+import threading
+import time
 import maintenance  # Import backup and restore
 
 app = Flask(__name__)
 
-# Restore data from maintenance.py
-meter_readings = maintenance.restore_backup()
+def ojson(obj, status=200):
+    """JSON response encoded with orjson instead of Flask's stdlib-based jsonify"""
+    return Response(orjson.dumps(obj), status=status, mimetype='application/json')
+
+_ts_cache = [0, ""]
+
+def fast_now():
+    """Current local time as an ISO string, formatted at most once per second"""
+    now = int(time.time())
+    if now != _ts_cache[0]:
+        _ts_cache[:] = [now, datetime.fromtimestamp(now).isoformat()]
+    return _ts_cache[1]
+
+# Readings are sharded by meter ID so requests for different meters rarely share a lock
+SHARD_COUNT = 16
+shards = [(threading.Lock(), {}) for _ in range(SHARD_COUNT)]
+
+def shard_for(meter_id):
+    """Return the (lock, readings) shard that owns a meter"""
+    return shards[hash(meter_id) & (SHARD_COUNT - 1)]
+
+# Each meter keeps a bounded window of readings in memory; older ones are archived to disk
+MAX_READINGS = 24 * 60 * 7  # One reading a minute for a week
+
+# Per-meter revision counters back the ETag on GET so unchanged polls get a 304.
+# The startup token keeps ETags from a previous process from matching after a restart.
+_revisions = {}
+STARTUP_TOKEN = f"{int(time.time())}-{os.getpid()}"
+
+# Pre-encoded JSON for each meter's readings, built on the first GET and then kept in step with
+# the readings deque by the consumer thread. Guarded by the shard lock.
+_body_cache = {}
+
+def snapshot_readings():
+    """Merge all shards into one dict for a backup snapshot.
+
+    Each meter's deque is copied into a new list under its shard lock; the consumer
+    thread keeps appending to and evicting from the deques, so they must not be shared.
+    """
+    snapshot = {}
+    for lock, readings in shards:
+        with lock:
+            snapshot.update((meter_id, list(meter_log)) for meter_id, meter_log in readings.items())
+    return snapshot
+
+# Restore data from maintenance.py. Readings replayed from the WAL that push a meter past
+# MAX_READINGS were archived by flush_readings when they were evicted, so only an oversized
+# snapshot (written before readings were bounded) has entries left to archive here.
+_trimmed = False
+_restored, _snapshot_sizes = maintenance.restore_backup()
+for meter_id, entries in _restored.items():
+    if len(entries) > MAX_READINGS:
+        unarchived = _snapshot_sizes.get(meter_id, 0) - MAX_READINGS
+        if unarchived > 0:
+            maintenance.archive_readings(meter_id, entries[:unarchived])
+        _trimmed = True
+    shard_for(meter_id)[1][meter_id] = deque(entries, maxlen=MAX_READINGS)
+if _trimmed:
+    maintenance.checkpoint(snapshot_readings())
+
+# Incoming readings are queued and flushed in batches by a single consumer thread
+BATCH_SIZE = 256
+BATCH_WINDOW = 0.05  # seconds
+_ingest_q = queue.SimpleQueue()
+
+def flush_readings():
+    """Drain queued readings into memory and the WAL, one batch at a time"""
+    while True:
+        batch = [_ingest_q.get()]
+        deadline = time.monotonic() + BATCH_WINDOW
+        while len(batch) < BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_ingest_q.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        grouped = {}
+        for meter_id, entry in batch:
+            grouped.setdefault(meter_id, []).append(entry)
+
+        try:
+            evicted = {}
+            for meter_id, entries in grouped.items():
+                lock, readings = shard_for(meter_id)
+                with lock:
+                    meter_log = readings.get(meter_id)
+                    if meter_log is None:
+                        meter_log = readings[meter_id] = deque(maxlen=MAX_READINGS)
+
+                    overflow = len(meter_log) + len(entries) - MAX_READINGS
+                    if overflow > 0:
+                        evicted[meter_id] = (
+                            list(islice(meter_log, overflow))
+                            + entries[:max(0, overflow - len(meter_log))]
+                        )
+                    meter_log.extend(entries)
+                    _revisions[meter_id] = _revisions.get(meter_id, 0) + len(entries)
+
+                    encoded = _body_cache.get(meter_id)
+                    if encoded is not None:
+                        encoded.extend(map(orjson.dumps, entries))
+
+            # Archive before the next snapshot drops evicted readings from the backup
+            for meter_id, old_entries in evicted.items():
+                maintenance.archive_readings(meter_id, old_entries)
+
+            if maintenance.append_readings(batch):
+                maintenance.checkpoint(snapshot_readings())
+        except Exception as e:
+            print(f"❌ Error flushing {len(batch)} readings: {e}")
+
+threading.Thread(target=flush_readings, daemon=True).start()
 
 @app.route('/')
 def home():
-    return jsonify({"message": "Electricity Meter API is Running!"})
+    return ojson({"message": "Electricity Meter API is Running!"})
 
 @app.route('/api/meter/reading', methods=['POST'])
 def receive_reading():
@@ -20,40 +139,77 @@ def receive_reading():
         data = request.json
         meter_id = data.get('meter_id')
         reading = data.get('reading')
-        timestamp = data.get('timestamp', datetime.now().isoformat())
+        timestamp = data.get('timestamp') or fast_now()
 
         if not meter_id or reading is None:
-            return jsonify({"error": "Missing meter_id or reading"}), 400
-
-        if meter_id not in meter_readings:
-            meter_readings[meter_id] = []
+            return ojson({"error": "Missing meter_id or reading"}, 400)
 
-        meter_readings[meter_id].append({
+        _ingest_q.put((meter_id, {
             "reading": float(reading),
             "timestamp": timestamp
-        })
+        }))
+
+        return ojson({"success": True, "message": "Reading accepted."}, 202)
+    except Exception as e:
+        return ojson({"error": str(e)}, 400)
+
+@app.route('/api/meter/readings/bulk', methods=['POST'])
+def receive_readings_bulk():
+    """Receive a batch of meter readings from the simulator in one request"""
+    try:
+        items = orjson.loads(request.get_data())
+        if not isinstance(items, list):
+            return ojson({"error": "Expected a list of readings"}, 400)
+
+        # Validate the whole batch first so a bad item rejects it without queuing a partial batch
+        accepted = []
+        for data in items:
+            meter_id = data.get('meter_id')
+            reading = data.get('reading')
+            if not meter_id or reading is None:
+                return ojson({"error": "Missing meter_id or reading"}, 400)
+            accepted.append((meter_id, {
+                "reading": float(reading),
+                "timestamp": data.get('timestamp') or fast_now()
+            }))
 
-        # Save backup after every new reading
-        maintenance.save_backup(meter_readings)
+        for item in accepted:
+            _ingest_q.put(item)
 
-        return jsonify({"success": True, "message": "Reading stored successfully."}), 200
+        return ojson({"success": True, "message": f"{len(accepted)} readings accepted."}, 202)
     except Exception as e:
-        return jsonify({"error": str(e)}), 400
+        return ojson({"error": str(e)}, 400)
 
 @app.route('/api/meter/reading/<meter_id>', methods=['GET'])
 def get_meter_readings(meter_id):
     """Fetch stored meter readings"""
-    if meter_id in meter_readings:
-        return jsonify(meter_readings[meter_id]), 200
-    return jsonify({"error": "No readings found"}), 404
+    lock, readings = shard_for(meter_id)
+    with lock:
+        meter_log = readings.get(meter_id)
+        if meter_log is None:
+            return ojson({"error": "No readings found"}, 404)
+
+        etag = f'"{STARTUP_TOKEN}-{_revisions.get(meter_id, 0)}"'
+        if request.headers.get('If-None-Match') == etag:
+            return Response(status=304, headers={'ETag': etag})
+
+        encoded = _body_cache.get(meter_id)
+        if encoded is None:
+            encoded = _body_cache[meter_id] = deque(map(orjson.dumps, meter_log), maxlen=MAX_READINGS)
+        payload = b"[" + b",".join(encoded) + b"]"
+
+    return Response(payload, status=200, mimetype='application/json', headers={'ETag': etag})
 
 @app.route('/api/meter/reading/all', methods=['GET'])
 def get_all_meter_ids():
     """Return all meter IDs that have readings"""
-    if not meter_readings:
-        return jsonify([])  # Return empty list if no meters found
-    return jsonify(list(meter_readings.keys()))
+    meter_ids = []
+    for lock, readings in shards:
+        with lock:
+            meter_ids.extend(readings.keys())
+    return ojson(meter_ids)  # Empty list if no meters found
 
 if __name__ == '__main__':
+    # Development entry point; in production run `gunicorn -c gunicorn_conf.py app:app`
     print("✅ Starting API on http://127.0.0.1:8080")
-    app.run(host='127.0.0.1', port=8080, debug=True)
+    app.run(host='127.0.0.1', port=8080, threaded=True)
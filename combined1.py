@@ -9,9 +9,11 @@ import os
 import csv
 import logging
 import json
+import orjson
 import threading
+import time
 from datetime import datetime, timedelta, date
-from flask import Flask, request, jsonify, render_template, g
+from flask import Flask, Response, request, render_template, g
 import dash
 import dash_core_components as dcc
 import dash_html_components as html
@@ -24,9 +26,14 @@ from dataclasses import dataclass
 from typing import Dict, List, Optional, Set
 import bisect
 from enum import Enum
+from functools import lru_cache
 
 app = Flask(__name__)
 
+def ojson(obj, status=200):
+    """JSON response encoded with orjson; also handles datetimes, enums and dataclasses"""
+    return Response(orjson.dumps(obj), status=status, mimetype='application/json')
+
 # ========== Logging System ==========
 class MeterLoggingSystem:
     def __init__(self, log_directory: str = "logs"):
@@ -68,7 +75,7 @@ class ReadingStatus(Enum):
     ARCHIVED = "archived"
     ERROR = "error"
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class MeterReading:
     reading_id: str
     meter_id: str
@@ -76,29 +83,51 @@ class MeterReading:
     value: float
     status: ReadingStatus
 
-@dataclass
+@dataclass(slots=True)
 class ElectricityAccount:
     account_id: str
     meter_id: str
     owner_name: str
     readings: List[MeterReading]
 
+_now_cache = [0, None]
+
+def fast_now() -> datetime:
+    """Current local time at second resolution, rebuilt at most once per second"""
+    now = int(time.time())
+    if now != _now_cache[0]:
+        _now_cache[:] = [now, datetime.fromtimestamp(now)]
+    return _now_cache[1]
+
 class MeterDataManager:
+    LOCK_STRIPES = 16
+
     def __init__(self):
         self.accounts: Dict[str, ElectricityAccount] = {}
         self.meter_readings: Dict[str, List[MeterReading]] = defaultdict(list)
+        # Striped locks: each meter's reading list is guarded by hash(meter_id) % LOCK_STRIPES
+        self._locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+
+    def _lock_for(self, meter_id: str) -> threading.Lock:
+        return self._locks[hash(meter_id) & (self.LOCK_STRIPES - 1)]
 
     def add_reading(self, meter_id: str, value: float):
-        reading = MeterReading(
-            reading_id=f"READ-{len(self.meter_readings[meter_id]) + 1}",
-            meter_id=meter_id,
-            timestamp=datetime.now(),
-            value=value,
-            status=ReadingStatus.RECEIVED
-        )
-        self.meter_readings[meter_id].append(reading)
+        with self._lock_for(meter_id):
+            readings = self.meter_readings[meter_id]
+            reading = MeterReading(
+                reading_id=f"READ-{len(readings) + 1}",
+                meter_id=meter_id,
+                timestamp=fast_now(),
+                value=value,
+                status=ReadingStatus.RECEIVED
+            )
+            readings.append(reading)
         return reading
 
+    def get_readings(self, meter_id: str) -> List[MeterReading]:
+        with self._lock_for(meter_id):
+            return list(self.meter_readings.get(meter_id, []))
+
 meter_manager = MeterDataManager()
 
 # ========== Account Registration ==========
@@ -112,32 +141,45 @@ def register_account():
         owner_name=data['name'],
         readings=[]
     )
-    return jsonify({"message": "Account registered successfully"})
+    return ojson({"message": "Account registered successfully"})
 
 # ========== Meter Reading ==========
 @app.route('/meter/<meter_id>/reading', methods=['POST'])
 def post_reading(meter_id):
     data = request.json
     reading = meter_manager.add_reading(meter_id, float(data['kwh']))
-    return jsonify({"message": "Reading received", "reading": reading.__dict__})
+    return ojson({"message": "Reading received", "reading": reading})
 
 @app.route('/meter/<meter_id>/consumption', methods=['GET'])
 def get_consumption(meter_id):
-    readings = meter_manager.meter_readings.get(meter_id, [])
-    return jsonify({"meter_id": meter_id, "readings": [r.__dict__ for r in readings]})
+    readings = meter_manager.get_readings(meter_id)
+    return ojson({"meter_id": meter_id, "readings": readings})
 
 # ========== Stop Readings for Batch Processing ==========
 @app.route('/admin/stop_and_batch', methods=['POST'])
 def stop_and_batch():
-    return jsonify({"message": "Batch processing executed"})
+    return ojson({"message": "Batch processing executed"})
 
 # ========== Interactive Dashboard ==========
+CSV_PATH = 'Electricity_Merged.csv'
+PARQUET_PATH = 'Electricity_Merged.parquet'
+
 try:
-    df = pd.read_csv('Electricity_Merged.csv')
+    # Parse the CSV once and keep a Parquet copy; later starts memory-map the Parquet file
+    if not os.path.exists(PARQUET_PATH) or (
+        os.path.exists(CSV_PATH) and os.path.getmtime(CSV_PATH) > os.path.getmtime(PARQUET_PATH)
+    ):
+        # Written aside and renamed into place so a killed conversion never leaves a torn file
+        pd.read_csv(CSV_PATH).to_parquet(f"{PARQUET_PATH}.tmp")
+        os.replace(f"{PARQUET_PATH}.tmp", PARQUET_PATH)
+    df = pd.read_parquet(PARQUET_PATH, engine='pyarrow', memory_map=True)
 except FileNotFoundError:
-    print("Error: 'Electricity_Merged.csv' file not found.")
+    print(f"Error: '{CSV_PATH}' file not found.")
     exit()
 
+# Pre-split by year so callbacks do a dict lookup instead of a boolean scan of df
+df_by_year = {year: year_df for year, year_df in df.groupby('Year')}
+
 dash_app = Dash(__name__, server=app, routes_pathname_prefix='/dashboard/')
 
 dash_app.layout = html.Div([
@@ -169,16 +211,30 @@ dash_app.layout = html.Div([
      Input('year-dropdown', 'value')]
 )
 def update_graph(col_chosen, selected_year):
-    filtered_df = df[df['Year'] == selected_year]
-    fig = px.histogram(
-        filtered_df,
+    return build_graph(col_chosen, selected_year)
+
+@lru_cache(maxsize=64)
+def build_graph(col_chosen, selected_year):
+    """Build the average-consumption chart once per (category, year); the dataset is static.
+
+    The figure is returned already serialized so Dash does not re-encode it on every callback.
+    """
+    filtered_df = df_by_year.get(selected_year, df.iloc[0:0])
+    avg_df = (
+        filtered_df.groupby(col_chosen, sort=False)["Average kWh per Account"]
+        .mean()
+        .reset_index()
+    )
+    fig = px.bar(
+        avg_df,
         x=col_chosen,
         y="Average kWh per Account",
-        histfunc='avg',
         title=f"Average kWh per Account by {col_chosen} in {selected_year}"
     )
     fig.update_layout(bargap=0.2)
-    return fig
+    return json.loads(fig.to_json())
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Development entry point; in production run `gunicorn -w 1 -k gthread --threads 8 combined1:app`
+    # (accounts and readings are in process memory, so keep a single worker)
+    app.run(threaded=True)
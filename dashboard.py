@@ -1,9 +1,19 @@
 from dash import Dash, html, dcc, dash_table
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
+from dash.exceptions import PreventUpdate
+from functools import lru_cache
+import json
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
 import plotly.express as px
 
+API_URL = "http://127.0.0.1:8080/api/meter/reading"
+
+# One pooled keep-alive session for all callbacks instead of a new connection per poll
+session = requests.Session()
+session.mount('http://', HTTPAdapter(pool_connections=8, pool_maxsize=16))
+
 # Initialize Dash
 app = Dash(__name__)
 app.title = "Electricity Usage Dashboard"
@@ -35,6 +45,9 @@ app.layout = html.Div([
     # Electricity Consumption Graph
     dcc.Graph(id='consumption-graph'),
 
+    # ETag of the readings currently shown, so unchanged polls can skip the redraw
+    dcc.Store(id='meter-etag'),
+
     # Interval Component for Periodic API Updates
     dcc.Interval(
         id='interval-component',
@@ -43,6 +56,11 @@ app.layout = html.Div([
     )
 ])
 
+@lru_cache(maxsize=None)
+def empty_figure(title):
+    """Placeholder figure, built and serialized once per title"""
+    return json.loads(px.line(title=title).to_json())
+
 # Fetch Available Meters
 @app.callback(
     Output('meter-selector', 'options'),
@@ -51,7 +69,7 @@ app.layout = html.Div([
 def update_meter_options(_):
     """Fetch available meter IDs from the API."""
     try:
-        response = requests.get("http://127.0.0.1:8080/api/meter/reading/all")
+        response = session.get(f"{API_URL}/all", timeout=2)
         if response.status_code == 200:
             meters = response.json()
             if not isinstance(meters, list) or not meters:
@@ -64,28 +82,44 @@ def update_meter_options(_):
 # Update Live Data & Graph
 @app.callback(
     [Output('live-meter-table', 'data'),
-     Output('consumption-graph', 'figure')],
+     Output('consumption-graph', 'figure'),
+     Output('meter-etag', 'data')],
     [Input('meter-selector', 'value'),
-     Input('interval-component', 'n_intervals')]
+     Input('interval-component', 'n_intervals')],
+    State('meter-etag', 'data')
 )
-def update_dashboard(meter_id, _):
+def update_dashboard(meter_id, _, shown):
     """Fetch the latest meter readings and update the table & graph."""
     if not meter_id:
-        return [], px.line(title="No Data Available")
+        return [], empty_figure("No Data Available"), None
+
+    headers = {}
+    if shown and shown.get('meter_id') == meter_id:
+        headers['If-None-Match'] = shown['etag']
 
     try:
-        response = requests.get(f"http://127.0.0.1:8080/api/meter/reading/{meter_id}")
+        response = session.get(f"{API_URL}/{meter_id}", headers=headers, timeout=2)
+        if response.status_code == 304:
+            raise PreventUpdate  # No new readings since the last poll
         if response.status_code == 200:
             meter_data = response.json()
         else:
-            return [], px.line(title="No Readings Found")
+            return [], empty_figure("No Readings Found"), None
+    except PreventUpdate:
+        raise
     except Exception as e:
         print(f"⚠️ Error fetching readings: {e}")
-        return [], px.line(title="API Error")
+        return [], empty_figure("API Error"), None
 
     df = pd.DataFrame(meter_data)
+    fig = px.line(
+        df, x='timestamp', y='reading',
+        title=f"Consumption for Meter {meter_id}",
+        render_mode='webgl'  # Scattergl keeps long reading histories responsive
+    )
 
-    return df.to_dict('records'), px.line(df, x='timestamp', y='reading', title=f"Consumption for Meter {meter_id}")
+    # The API already returns table-ready records; no need to round-trip them through the frame
+    return meter_data, fig, {'meter_id': meter_id, 'etag': response.headers.get('ETag')}
 
 if __name__ == '__main__':
     app.run_server(debug=True, port=8050)
@@ -1,26 +1,132 @@
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
-from datetime import datetime
-from typing import Dict, List, Optional
-import json
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import orjson
+import mmap
 import os
 import pickle
-@dataclass
+import queue
+import struct
+import threading
+import time
+# Operation log entries buffered in memory before an explicit flush
+LOG_FLUSH_EVERY = 50
+# One reading in the shared log: (meter_id length, int64 nanoseconds since epoch, float64 kWh),
+# followed by the UTF-8 meter_id
+READING_RECORD = struct.Struct('<Hqd')
+# One reading in a per-meter log from before the shared log: (int64 ns, float64 kWh)
+LEGACY_READING_RECORD = struct.Struct('<qd')
+def _to_ns(ts: datetime) -> int:
+    return int(ts.timestamp()) * 1_000_000_000 + ts.microsecond * 1000
+def _from_ns(ts_ns: int) -> datetime:
+    seconds, ns = divmod(ts_ns, 1_000_000_000)
+    return datetime.fromtimestamp(seconds).replace(microsecond=ns // 1000)
+@dataclass(slots=True)
 class MeterReading:
     timestamp: datetime
     value: float
-@dataclass
+    
+    def __setstate__(self, state):
+        # Pickles from before slots carry a __dict__ state; slotted ones a (None, slots) pair
+        if isinstance(state, tuple):
+            state = state[1]
+        for name, value in state.items():
+            setattr(self, name, value)
+class DailyReadings:
+    """One day of readings for a meter, stored as parallel numpy arrays.
+    
+    Timestamps are int64 nanoseconds since the epoch and values float64 kWh; the
+    arrays grow by doubling. Iterating or indexing yields MeterReading views.
+    """
+    __slots__ = ('_ts', '_val', '_n')
+    
+    def __init__(self, capacity: int = 64):
+        self._ts = np.empty(capacity, dtype=np.int64)
+        self._val = np.empty(capacity, dtype=np.float64)
+        self._n = 0
+    
+    def append(self, ts_ns: int, value: float):
+        if self._n == len(self._val):
+            self._ts = np.resize(self._ts, 2 * self._n)
+            self._val = np.resize(self._val, 2 * self._n)
+        self._ts[self._n] = ts_ns
+        self._val[self._n] = value
+        self._n += 1
+    
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._ts[:self._n]
+    
+    @property
+    def values(self) -> np.ndarray:
+        return self._val[:self._n]
+    
+    def consumption(self) -> float:
+        """kWh used over the day: last cumulative reading minus the first"""
+        return float(self._val[self._n - 1] - self._val[0]) if self._n else 0.0
+    
+    def __len__(self) -> int:
+        return self._n
+    
+    def __getitem__(self, index: int) -> MeterReading:
+        if index < 0:
+            index += self._n
+        if not 0 <= index < self._n:
+            raise IndexError("reading index out of range")
+        return MeterReading(_from_ns(int(self._ts[index])), float(self._val[index]))
+    
+    def __iter__(self) -> Iterator[MeterReading]:
+        for ts_ns, value in zip(self.timestamps.tolist(), self.values.tolist()):
+            yield MeterReading(_from_ns(ts_ns), value)
+@dataclass(slots=True)
 class Account:
     meter_id: str
     owner_name: str
     dwelling_type: str
     region: str
     area: str
-    readings: Dict[str, List[MeterReading]] = field(default_factory=dict)
+    readings: Dict[str, DailyReadings] = field(default_factory=dict)
+    
+    def __getstate__(self):
+        # Readings live in the append-only log; the pickle only holds account metadata
+        state = {name: getattr(self, name) for name in self.__slots__}
+        state['readings'] = {}
+        return state
+    
+    def __setstate__(self, state: dict):
+        for name, value in state.items():
+            setattr(self, name, value)
+@dataclass
+class GroupCommitSettings:
+    """Batching limits for the background reading writer.
+    
+    Below min_batch_size the writer waits up to max_wait_us for more readings;
+    once it has min_batch_size it commits as soon as the queue runs dry.
+    """
+    min_batch_size: int = 8
+    max_batch_size: int = 64
+    max_wait_us: int = 1000
 class Storage:
-    def __init__(self):
+    def __init__(self, commit_settings: Optional[GroupCommitSettings] = None):
         self.accounts: Dict[str, Account] = {}
         self.base_path = "storage"
+        self.commit_settings = commit_settings or GroupCommitSettings()
+        self._lock = threading.Lock()  # Guards accounts against the writer thread
+        self._pending: queue.Queue = queue.Queue()
+        self._reading_log = None  # Unbuffered append handle for the shared reading log
+        self._log_lock = threading.Lock()
+        self._log_fh = None  # Buffered handle for the current month's operation log
+        self._log_month = None
+        self._log_unflushed = 0
+        # (day start ns, next day start ns, "%Y-%m-%d" key, "%Y%m" key) for the current local day
+        self._today = (0, 0, None, None)
         self.ensure_directories()
+        self._writer = threading.Thread(target=self._commit_loop, daemon=True)
+        self._writer.start()
     
     def ensure_directories(self):
         """Create necessary directories"""
@@ -35,11 +141,12 @@ class Storage:
     
     def save_account(self, account: Account):
         """Save account and log the operation"""
-        self.accounts[account.meter_id] = account
-        
-        # Save to file
-        with open(f"storage/accounts/{account.meter_id}.pkl", 'wb') as f:
-            pickle.dump(account, f)
+        with self._lock:
+            self.accounts[account.meter_id] = account
+            
+            # Save to file
+            with open(f"storage/accounts/{account.meter_id}.pkl", 'wb') as f:
+                pickle.dump(account, f, protocol=pickle.HIGHEST_PROTOCOL)
         
         # Log operation
         self._log_operation("create_account", {
@@ -47,87 +154,290 @@ class Storage:
             "timestamp": datetime.now().isoformat()
         })
     
-    def add_reading(self, meter_id: str, reading: float):
-        """Add meter reading and log the operation"""
+    def add_reading(self, meter_id: str, reading: float) -> Future:
+        """Queue a meter reading for the next group commit.
+        
+        Returns a future that resolves once the reading has been written and fsynced,
+        or raises the error that stopped its batch from being committed.
+        """
         if meter_id not in self.accounts:
             raise ValueError("Account not found")
         
-        current_time = datetime.now()
-        date_key = current_time.strftime("%Y-%m-%d")
+        done = Future()
+        self._pending.put((meter_id, time.time_ns(), reading, done))
+        return done
+    
+    def drain(self):
+        """Block until every reading queued so far has been committed or has failed"""
+        self._pending.join()
+    
+    def _day_keys(self, ts_ns: int):
+        """Date and month keys for a timestamp, formatted only when the day changes"""
+        start, end, date_key, month_key = self._today
+        if not start <= ts_ns < end:
+            midnight = _from_ns(ts_ns).replace(hour=0, minute=0, second=0, microsecond=0)
+            start = _to_ns(midnight)
+            end = _to_ns(midnight + timedelta(days=1))
+            date_key = midnight.strftime("%Y-%m-%d")
+            month_key = midnight.strftime("%Y%m")
+            self._today = (start, end, date_key, month_key)
+        return date_key, month_key
+    
+    def _commit_loop(self):
+        """Writer thread: collect readings into batches and commit each batch at once"""
+        settings = self.commit_settings
+        while True:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + settings.max_wait_us / 1_000_000
+            while len(batch) < settings.max_batch_size:
+                if len(batch) >= settings.min_batch_size:
+                    try:
+                        batch.append(self._pending.get_nowait())
+                        continue
+                    except queue.Empty:
+                        break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._commit_batch(batch)
+    
+    def _commit_batch(self, batch):
+        """Commit a batch of readings and resolve each reading's future"""
+        try:
+            self._write_batch(batch)
+        except Exception as e:
+            print(f"Error committing {len(batch)} readings: {e}")
+            for *_, done in batch:
+                done.set_exception(e)
+        else:
+            for *_, done in batch:
+                done.set_result(None)
+            
+            # Log operations
+            try:
+                for meter_id, ts_ns, reading, _ in batch:
+                    self._log_operation("add_reading", {
+                        "meter_id": meter_id,
+                        "reading": reading,
+                        "timestamp": _from_ns(ts_ns)
+                    })
+            except Exception as e:
+                print(f"Error logging {len(batch)} readings: {e}")
+        finally:
+            for _ in batch:
+                self._pending.task_done()
+    
+    def _write_batch(self, batch):
+        """Append the batch to the shared reading log with one fsync, then apply it in memory.
         
-        if date_key not in self.accounts[meter_id].readings:
-            self.accounts[meter_id].readings[date_key] = []
+        Accounts only change once the readings are on disk, so a failed write
+        leaves memory as it was.
+        """
+        self._append_records(b''.join(
+            self._pack_reading(meter_id, ts_ns, reading)
+            for meter_id, ts_ns, reading, _ in batch
+        ))
         
-        reading_obj = MeterReading(current_time, reading)
-        self.accounts[meter_id].readings[date_key].append(reading_obj)
+        with self._lock:
+            for meter_id, ts_ns, reading, _ in batch:
+                account = self.accounts[meter_id]
+                date_key = self._day_keys(ts_ns)[0]
+                day = account.readings.get(date_key)
+                if day is None:
+                    day = account.readings[date_key] = DailyReadings()
+                day.append(ts_ns, reading)
+    
+    @staticmethod
+    def _pack_reading(meter_id: str, ts_ns: int, value: float) -> bytes:
+        raw_id = meter_id.encode()
+        return READING_RECORD.pack(len(raw_id), ts_ns, value) + raw_id
+    
+    def _append_records(self, records: bytes):
+        """Write packed readings to the shared log and fsync once.
         
-        # Save updated account
-        with open(f"storage/accounts/{meter_id}.pkl", 'wb') as f:
-            pickle.dump(self.accounts[meter_id], f)
+        On failure the log is cut back to where it was, so no part of the records stays behind.
+        """
+        log = self._reading_log
+        if log is None:
+            log = self._reading_log = open(f"{self.base_path}/readings/readings.log", 'ab', buffering=0)
+        offset = os.lseek(log.fileno(), 0, os.SEEK_END)
+        try:
+            view = memoryview(records)
+            while view:
+                view = view[log.write(view):]
+            os.fsync(log.fileno())
+        except BaseException:
+            os.truncate(log.fileno(), offset)
+            raise
+    
+    def _read_reading_log(self) -> Dict[str, List[tuple]]:
+        """Read the shared log once and group its (ts_ns, value) pairs by meter"""
+        path = f"{self.base_path}/readings/readings.log"
+        logged: Dict[str, List[tuple]] = {}
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return logged
         
-        # Log operation
-        self._log_operation("add_reading", {
-            "meter_id": meter_id,
-            "reading": reading,
-            "timestamp": current_time.isoformat()
-        })
+        meter_ids: Dict[bytes, str] = {}
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            size = len(mm)
+            pos = 0
+            while pos + READING_RECORD.size <= size:
+                id_len, ts_ns, value = READING_RECORD.unpack_from(mm, pos)
+                end = pos + READING_RECORD.size + id_len
+                if end > size:
+                    break
+                raw_id = mm[pos + READING_RECORD.size:end]
+                meter_id = meter_ids.get(raw_id)
+                if meter_id is None:
+                    meter_id = meter_ids[raw_id] = raw_id.decode()
+                logged.setdefault(meter_id, []).append((ts_ns, value))
+                pos = end
+        
+        # Drop a torn record left by a crash mid-write so later appends parse cleanly
+        if pos != size:
+            os.truncate(path, pos)
+        return logged
+    
+    def _load_legacy_log(self, meter_id: str) -> List[tuple]:
+        """(ts_ns, value) pairs from a per-meter log written before the shared log"""
+        path = f"{self.base_path}/readings/{meter_id}.log"
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return []
+        with open(path, 'rb') as f:
+            data = f.read()
+        usable = len(data) - len(data) % LEGACY_READING_RECORD.size
+        return list(LEGACY_READING_RECORD.iter_unpack(data[:usable]))
+    
+    def _migrate_readings(self, account: Account, legacy: List[tuple], logged: List[tuple]):
+        """Move readings held outside the shared log into it, then drop the old copies.
+        
+        Readings already in the shared log are skipped, so a migration interrupted
+        before the old copies were removed does not duplicate them on the next restore.
+        """
+        seen = set(logged)
+        missing = [record for record in legacy if record not in seen]
+        if missing:
+            self._append_records(b''.join(
+                self._pack_reading(account.meter_id, ts_ns, value) for ts_ns, value in missing
+            ))
+            logged.extend(missing)
+        
+        # Re-pickle without readings, then remove the per-meter log
+        account_file = f"{self.base_path}/accounts/{account.meter_id}.pkl"
+        with open(f"{account_file}.tmp", 'wb') as f:
+            pickle.dump(account, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{account_file}.tmp", account_file)
+        legacy_log = f"{self.base_path}/readings/{account.meter_id}.log"
+        if os.path.exists(legacy_log):
+            os.remove(legacy_log)
     
     def _log_operation(self, operation_type: str, data: dict):
         """Log operations for recovery"""
+        ts_ns = time.time_ns()
         log_entry = {
             "operation": operation_type,
             "data": data,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _from_ns(ts_ns)
         }
         
-        log_file = f"storage/logs/operations_{datetime.now().strftime('%Y%m')}.log"
-        with open(log_file, 'a') as f:
-            f.write(json.dumps(log_entry) + '\n')
+        line = orjson.dumps(log_entry, option=orjson.OPT_APPEND_NEWLINE)
+        month = self._day_keys(ts_ns)[1]
+        with self._log_lock:
+            if month != self._log_month:
+                if self._log_fh is not None:
+                    self._log_fh.close()
+                self._log_fh = open(f"{self.base_path}/logs/operations_{month}.log", 'ab')
+                self._log_month = month
+                self._log_unflushed = 0
+            
+            self._log_fh.write(line)
+            self._log_unflushed += 1
+            if self._log_unflushed >= LOG_FLUSH_EVERY:
+                self._log_fh.flush()
+                self._log_unflushed = 0
+    
+    def checkpoint(self):
+        """Flush buffered operation log entries and fsync them to disk"""
+        with self._log_lock:
+            if self._log_fh is not None:
+                self._log_fh.flush()
+                os.fsync(self._log_fh.fileno())
+                self._log_unflushed = 0
+    
+    def _restore_account(self, path: str):
+        """Load one account pickle straight from the page cache.
+        
+        Returns the account along with any readings still kept outside the shared
+        log, in the pickle itself or in a per-meter log, as (ts_ns, value) pairs.
+        """
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            account = pickle.loads(mm)
+        legacy = [
+            (_to_ns(reading.timestamp), reading.value)
+            for day in account.readings.values()
+            for reading in day
+        ]
+        account.readings = {}
+        legacy.extend(self._load_legacy_log(account.meter_id))
+        return account, legacy
     
     def restore_from_logs(self):
         """Restore system state from logs"""
-        self.accounts.clear()
+        accounts_path = f"{self.base_path}/accounts"
+        paths = [
+            f"{accounts_path}/{filename}"
+            for filename in os.listdir(accounts_path)
+            if filename.endswith('.pkl')
+        ]
+        
+        # Account files are independent, so overlap their disk reads across threads
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+            restored = list(executor.map(self._restore_account, paths))
         
-        # First restore accounts
-        accounts_path = "storage/accounts"
-        for filename in os.listdir(accounts_path):
-            if filename.endswith('.pkl'):
-                with open(f"{accounts_path}/{filename}", 'rb') as f:
-                    account = pickle.load(f)
-                    self.accounts[account.meter_id] = account
+        logged = self._read_reading_log()
+        for account, legacy in restored:
+            if legacy:
+                self._migrate_readings(account, legacy, logged.setdefault(account.meter_id, []))
+        
+        accounts = {account.meter_id: account for account, _ in restored}
+        for meter_id, records in logged.items():
+            account = accounts.get(meter_id)
+            if account is None:
+                continue
+            for ts_ns, value in records:
+                date_key = self._day_keys(ts_ns)[0]
+                day = account.readings.get(date_key)
+                if day is None:
+                    day = account.readings[date_key] = DailyReadings()
+                day.append(ts_ns, value)
+        
+        with self._lock:
+            self.accounts.clear()
+            self.accounts.update(accounts)
     
-    def archive_daily_data(self):
-        """Archive current day's data"""
-        current_date = datetime.now().strftime("%Y-%m-%d")
-        archive_path = f"storage/archive/daily/{current_date}"
-        os.makedirs(archive_path, exist_ok=True)
-        
-        for account in self.accounts.values():
-            if current_date in account.readings:
-                readings = account.readings[current_date]
-                with open(f"{archive_path}/{account.meter_id}.json", 'w') as f:
-                    json.dump([{
-                        "timestamp": r.timestamp.isoformat(),
-                        "value": r.value
-                    } for r in readings], f)
-                
-                # Clear from memory
-                del account.readings[current_date]
-                
     def save_all_data(self):
         """Save all current data to storage"""
         try:
+            # Let queued readings reach their logs first
+            self.drain()
+            
             # Save accounts
-            for meter_id, account in self.accounts.items():
-                account_file = f"{self.base_path}/accounts/{meter_id}.pkl"
-                with open(account_file, 'wb') as f:
-                    pickle.dump(account, f)
+            with self._lock:
+                for meter_id, account in self.accounts.items():
+                    account_file = f"{self.base_path}/accounts/{meter_id}.pkl"
+                    with open(account_file, 'wb') as f:
+                        pickle.dump(account, f, protocol=pickle.HIGHEST_PROTOCOL)
             
             # Log the save operation
             self._log_operation("save_all", {
                 "timestamp": datetime.now().isoformat(),
                 "accounts_saved": list(self.accounts.keys())
             })
+            self.checkpoint()
             
             return True
         except Exception as e:
@@ -137,23 +447,37 @@ class Storage:
         """Archive current day's data"""
         try:
             current_date = datetime.now().strftime("%Y-%m-%d")
-            archive_path = f"{self.base_path}/archive/daily/{current_date}"
+            archive_path = f"{self.base_path}/archive/daily"
             os.makedirs(archive_path, exist_ok=True)
             
-            for meter_id, account in self.accounts.items():
-                if current_date in account.readings:
-                    # Save readings to archive
-                    archive_file = f"{archive_path}/{meter_id}.json"
-                    readings_data = [
-                        {
-                            "timestamp": reading.timestamp.isoformat(),
-                            "value": reading.value
-                        }
-                        for reading in account.readings[current_date]
-                    ]
-                    
-                    with open(archive_file, 'w') as f:
-                        json.dump(readings_data, f, indent=2)
+            # Gather every meter's readings for the day into three columns
+            meter_ids: List[str] = []
+            timestamps: List[np.ndarray] = []
+            values: List[np.ndarray] = []
+            with self._lock:
+                for meter_id, account in self.accounts.items():
+                    day = account.readings.get(current_date)
+                    if day:
+                        meter_ids.extend([meter_id] * len(day))
+                        timestamps.append(day.timestamps.copy())
+                        values.append(day.values.copy())
+            
+            # One Parquet file per day holds all meters; written aside and renamed into
+            # place so readers never see a half-written archive
+            if meter_ids:
+                table = pa.table({
+                    "meter_id": pa.array(meter_ids, pa.string()),
+                    "timestamp": pa.array(np.concatenate(timestamps), pa.timestamp('ns', tz='UTC')),
+                    "value": pa.array(np.concatenate(values), pa.float64())
+                })
+                archive_file = f"{archive_path}/{current_date}.parquet"
+                pq.write_table(
+                    table,
+                    f"{archive_file}.tmp",
+                    compression='zstd',
+                    use_dictionary=['meter_id']
+                )
+                os.replace(f"{archive_file}.tmp", archive_file)
         
         # Log the archive operation
             self._log_operation("archive_daily", {
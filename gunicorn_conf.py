@@ -0,0 +1,14 @@
+# Gunicorn settings for the meter API:
+#     gunicorn -c gunicorn_conf.py app:app
+import os
+
+bind = os.environ.get("METER_API_BIND", "127.0.0.1:8080")
+
+# Readings, the ingest queue and the WAL live in process memory, so exactly one
+# worker must own them; concurrency comes from threads inside that worker.
+workers = 1
+worker_class = "gthread"
+threads = int(os.environ.get("METER_API_THREADS", (os.cpu_count() or 1) * 4))
+
+keepalive = 5  # Dashboard and simulators reuse connections between polls
+timeout = 30
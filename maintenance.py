@@ -1,33 +1,119 @@
 import os
-import json
+import orjson
 from datetime import datetime
 
 BACKUP_PATH = "storage/readings"
+WAL_PATH = "storage/readings.wal"
+ARCHIVE_PATH = "storage/archive/readings"
+SNAPSHOT_EVERY = 500  # Readings appended to the WAL between full snapshots
+
+_wal = None
+_pending = 0
+_seq = 0  # Sequence number of the last reading written to the WAL
 
 def ensure_backup_directory():
     """Ensure the backup directory exists."""
     os.makedirs(BACKUP_PATH, exist_ok=True)
 
-def save_backup(meter_readings):
-    """Save all readings to JSON files"""
+def save_backup(meter_readings, wal_seq=0):
+    """Save all readings to JSON files, each tagged with the last WAL sequence it covers"""
     ensure_backup_directory()
     for meter_id, readings in meter_readings.items():
-        with open(f"{BACKUP_PATH}/{meter_id}.json", "w") as f:
-            json.dump(readings, f, indent=2)
+        path = f"{BACKUP_PATH}/{meter_id}.json"
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(orjson.dumps({"wal_seq": wal_seq, "readings": readings}, option=orjson.OPT_INDENT_2))
+        os.replace(f"{path}.tmp", path)
     print("✅ Backup saved successfully!")
 
+def append_readings(batch):
+    """Append a batch of (meter_id, entry) pairs to the write-ahead log in one write"""
+    global _wal, _pending, _seq
+    if _wal is None:
+        ensure_backup_directory()
+        _wal = open(WAL_PATH, "ab")
+    _wal.write(b"".join(
+        orjson.dumps({"meter_id": meter_id, "seq": seq, **entry}, option=orjson.OPT_APPEND_NEWLINE)
+        for seq, (meter_id, entry) in enumerate(batch, _seq + 1)
+    ))
+    _seq += len(batch)
+    _wal.flush()
+    _pending += len(batch)
+    return _pending >= SNAPSHOT_EVERY
+
+def checkpoint(meter_readings):
+    """Write a full snapshot and start a fresh write-ahead log.
+
+    Each snapshot file records the WAL sequence it covers, so a crash before the
+    WAL is truncated does not replay those readings twice.
+    """
+    global _wal, _pending
+    save_backup(meter_readings, _seq)
+    if _wal is not None:
+        _wal.close()
+    _wal = open(WAL_PATH, "wb")
+    _pending = 0
+
+def replay_wal(meter_readings, snapshot_seqs=None):
+    """Apply readings logged since the last snapshot.
+
+    snapshot_seqs maps meter_id to the last WAL sequence already in its snapshot;
+    entries at or below it are skipped.
+    """
+    global _seq
+    if not os.path.exists(WAL_PATH):
+        return 0
+
+    snapshot_seqs = snapshot_seqs or {}
+    replayed = 0
+    with open(WAL_PATH, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = orjson.loads(line)
+            meter_id = entry.pop("meter_id")
+            seq = entry.pop("seq", None)
+            if seq is not None:
+                _seq = max(_seq, seq)
+                if seq <= snapshot_seqs.get(meter_id, 0):
+                    continue
+            meter_readings.setdefault(meter_id, []).append(entry)
+            replayed += 1
+    return replayed
+
+def archive_readings(meter_id, entries):
+    """Append readings evicted from memory to the meter's archive file"""
+    os.makedirs(ARCHIVE_PATH, exist_ok=True)
+    with open(f"{ARCHIVE_PATH}/{meter_id}.jsonl", "ab") as f:
+        f.write(b"".join(orjson.dumps(entry, option=orjson.OPT_APPEND_NEWLINE) for entry in entries))
+
 def restore_backup():
-    """Restore readings from JSON backup files"""
+    """Restore readings from JSON backup files and the write-ahead log.
+
+    Returns the readings per meter and, per meter, how many of them came from
+    the snapshot rather than the WAL.
+    """
+    global _seq
     meter_readings = {}
+    snapshot_seqs = {}
     ensure_backup_directory()
     
     for filename in os.listdir(BACKUP_PATH):
+        if not filename.endswith(".json"):
+            continue
         meter_id = filename.replace(".json", "")
-        with open(f"{BACKUP_PATH}/{filename}", "r") as f:
-            meter_readings[meter_id] = json.load(f)
+        with open(f"{BACKUP_PATH}/{filename}", "rb") as f:
+            backup = orjson.loads(f.read())
+        # Backups written before sequence tagging are a bare list of readings
+        if isinstance(backup, list):
+            backup = {"wal_seq": 0, "readings": backup}
+        meter_readings[meter_id] = backup["readings"]
+        snapshot_seqs[meter_id] = backup["wal_seq"]
+        _seq = max(_seq, backup["wal_seq"])
 
-    print(f"✅ Restored data for {len(meter_readings)} meters.")
-    return meter_readings
+    snapshot_sizes = {meter_id: len(readings) for meter_id, readings in meter_readings.items()}
+    replayed = replay_wal(meter_readings, snapshot_seqs)
+    print(f"✅ Restored data for {len(meter_readings)} meters ({replayed} readings from WAL).")
+    return meter_readings, snapshot_sizes
 
 def archive_old_data():
     """Archive old meter readings"""
@@ -35,6 +121,8 @@ def archive_old_data():
     os.makedirs(archive_path, exist_ok=True)
 
     for filename in os.listdir(BACKUP_PATH):
+        if not filename.endswith(".json"):
+            continue
         old_path = f"{BACKUP_PATH}/{filename}"
         new_path = f"{archive_path}/{filename}"
         os.rename(old_path, new_path)
@@ -44,6 +132,6 @@ def archive_old_data():
 # If you want to run maintenance manually
 if __name__ == "__main__":
     print("🔄 Running Maintenance Tasks...")
-    readings = restore_backup()
-    save_backup(readings)
+    readings, _ = restore_backup()
+    checkpoint(readings)
     archive_old_data()
@@ -1,11 +1,12 @@
 from dataclasses import dataclass
-from datetime import datetime, date, timedelta
+from datetime import datetime, date
 from typing import Dict, List, Optional, Set
 import json
 from collections import defaultdict
 import threading
 import bisect
 from enum import Enum
+from operator import attrgetter
 import logging
 
 class MeterReadingException(Exception):
@@ -19,7 +20,7 @@ class ReadingStatus(Enum):
     ARCHIVED = "archived"
     ERROR = "error"
 
-@dataclass
+@dataclass(slots=True)
 class Address:
     """Class for storing address information"""
     postal_code: str
@@ -35,7 +36,7 @@ class Address:
             "building_name": self.building_name
         }
 
-@dataclass
+@dataclass(slots=True)
 class AccountOwner:
     """Class for storing account owner information"""
     owner_id: str
@@ -65,7 +66,7 @@ class AccountOwner:
             "family_members": list(self.family_members)
         }
 
-@dataclass
+@dataclass(slots=True)
 class MeterReading:
     """Class for storing individual meter readings"""
     reading_id: str
@@ -83,33 +84,82 @@ class MeterReading:
             "status": self.status.value
         }
 
+_by_timestamp = attrgetter('timestamp')
+EMPTY: tuple = ()  # Shared result for days without readings
+
 class ElectricityAccount:
     """Class representing an electricity account"""
+    __slots__ = (
+        'account_id', 'meter_id', 'owner', 'readings', 'readings_by_date', 'sorted_days',
+        'daily_totals', 'creation_date', 'last_reading_date', '_lock', '_sorted', '_unsorted_days'
+    )
+    
     def __init__(self, account_id: str, meter_id: str, owner: AccountOwner):
         self.account_id = account_id
         self.meter_id = meter_id
         self.owner = owner
         self.readings: List[MeterReading] = []
-        self.readings_by_date: Dict[date, List[MeterReading]] = defaultdict(list)
+        self.readings_by_date: Dict[date, List[MeterReading]] = {}
+        self.sorted_days: List[date] = []  # Keys of readings_by_date, kept sorted for range queries
+        self.daily_totals: Dict[date, float] = {}  # Per-day consumption, maintained on every add
         self.creation_date = datetime.now()
         self.last_reading_date: Optional[datetime] = None
         self._lock = threading.Lock()
+        # Readings normally arrive in order; out-of-order ones are sorted lazily on query
+        self._sorted = True
+        self._unsorted_days: Set[date] = set()
     
     def add_reading(self, reading: MeterReading) -> None:
         """Add a new meter reading with thread safety"""
         with self._lock:
-            # Insert reading in chronological order
-            bisect.insort(self.readings, reading, key=lambda x: x.timestamp)
-            reading_date = reading.timestamp.date()
-            bisect.insort(
-                self.readings_by_date[reading_date],
-                reading,
-                key=lambda x: x.timestamp
+            self._append_reading(reading)
+    
+    def record_reading(self, value: float, timestamp: datetime) -> MeterReading:
+        """Create this account's next reading and add it under a single lock acquisition"""
+        with self._lock:
+            reading = MeterReading(
+                reading_id=f"READ-{len(self.readings) + 1:06d}",
+                meter_id=self.meter_id,
+                timestamp=timestamp,
+                value=value,
+                status=ReadingStatus.RECEIVED
             )
-            self.last_reading_date = reading.timestamp
+            self._append_reading(reading)
+        return reading
+    
+    def _append_reading(self, reading: MeterReading) -> None:
+        """Append a reading; caller holds self._lock"""
+        if self.readings and reading.timestamp < self.readings[-1].timestamp:
+            self._sorted = False
+        self.readings.append(reading)
+        
+        reading_date = reading.timestamp.date()
+        day_readings = self.readings_by_date.get(reading_date)
+        if day_readings is None:
+            day_readings = self.readings_by_date[reading_date] = []
+            bisect.insort(self.sorted_days, reading_date)
+        elif reading.timestamp < day_readings[-1].timestamp:
+            self._unsorted_days.add(reading_date)
+        day_readings.append(reading)
+        
+        self.daily_totals[reading_date] = self.daily_totals.get(reading_date, 0.0) + reading.value
+        self.last_reading_date = reading.timestamp
+    
+    def _ensure_sorted(self) -> None:
+        """Restore chronological order after out-of-order readings"""
+        if self._sorted and not self._unsorted_days:
+            return
+        with self._lock:
+            if not self._sorted:
+                self.readings.sort(key=_by_timestamp)
+                self._sorted = True
+            for day in self._unsorted_days:
+                self.readings_by_date[day].sort(key=_by_timestamp)
+            self._unsorted_days.clear()
     
     def get_latest_reading(self) -> Optional[MeterReading]:
         """Get the most recent reading"""
+        self._ensure_sorted()
         return self.readings[-1] if self.readings else None
     
     def get_readings_by_date_range(
@@ -118,19 +168,26 @@ class ElectricityAccount:
         end_date: date
     ) -> List[MeterReading]:
         """Get readings within a date range"""
+        self._ensure_sorted()
+        days = self.sorted_days
+        lo = bisect.bisect_left(days, start_date)
+        hi = bisect.bisect_right(days, end_date)
         result = []
-        current_date = start_date
-        while current_date <= end_date:
-            result.extend(self.readings_by_date[current_date])
-            current_date += timedelta(days=1)
+        get_day = self.readings_by_date.get
+        for day in days[lo:hi]:
+            result.extend(get_day(day, EMPTY))
         return result
     
     def get_daily_consumption(self, target_date: date) -> float:
         """Calculate total consumption for a specific date"""
-        daily_readings = self.readings_by_date[target_date]
-        if not daily_readings:
-            return 0.0
-        return sum(reading.value for reading in daily_readings)
+        return self.daily_totals.get(target_date, 0.0)
+
+    def get_daily_totals(self, start_date: date, end_date: date) -> Dict[date, float]:
+        """Get per-day consumption totals within a date range"""
+        days = self.sorted_days
+        lo = bisect.bisect_left(days, start_date)
+        hi = bisect.bisect_right(days, end_date)
+        return {day: self.daily_totals[day] for day in days[lo:hi]}
     
     def to_dict(self) -> dict:
         return {
@@ -147,7 +204,7 @@ class MeterDataManager:
         self.accounts: Dict[str, ElectricityAccount] = {}
         self.meters: Dict[str, str] = {}  # meter_id -> account_id mapping
         self.owners: Dict[str, Set[str]] = defaultdict(set)  # owner_id -> account_ids mapping
-        self._lock = threading.Lock()
+        self._lock = threading.Lock()  # Account creation only; readings lock per account
         self.logger = logging.getLogger('meter_data_manager')
     
     def create_account(
@@ -173,24 +230,16 @@ class MeterDataManager:
     
     def add_reading(self, meter_id: str, value: float) -> MeterReading:
         """Add a new meter reading"""
-        with self._lock:
-            if meter_id not in self.meters:
-                raise MeterReadingException(f"Unknown meter ID: {meter_id}")
-            
-            account_id = self.meters[meter_id]
-            account = self.accounts[account_id]
-            
-            reading = MeterReading(
-                reading_id=f"READ-{len(account.readings) + 1:06d}",
-                meter_id=meter_id,
-                timestamp=datetime.now(),
-                value=value,
-                status=ReadingStatus.RECEIVED
-            )
-            
-            account.add_reading(reading)
-            self.logger.info(f"Added reading for meter {meter_id}: {value} kWh")
-            return reading
+        # Mappings only change under self._lock during creation, so lookups need no lock;
+        # readings for different meters then never contend
+        account_id = self.meters.get(meter_id)
+        if account_id is None:
+            raise MeterReadingException(f"Unknown meter ID: {meter_id}")
+        account = self.accounts[account_id]
+        
+        reading = account.record_reading(value, datetime.now())
+        self.logger.info("Added reading for meter %s: %s kWh", meter_id, value)
+        return reading
     
     def get_account_by_meter(self, meter_id: str) -> Optional[ElectricityAccount]:
         """Get account information by meter ID"""
@@ -213,12 +262,8 @@ class MeterDataManager:
         if not account:
             raise MeterReadingException(f"Unknown account ID: {account_id}")
         
-        readings = account.get_readings_by_date_range(start_date, end_date)
-        total_consumption = sum(reading.value for reading in readings)
-        daily_consumption = defaultdict(float)
-        
-        for reading in readings:
-            daily_consumption[reading.timestamp.date()] += reading.value
+        daily_consumption = account.get_daily_totals(start_date, end_date)
+        total_consumption = sum(daily_consumption.values())
         
         return {
             "account_id": account_id,
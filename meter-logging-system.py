@@ -1,19 +1,191 @@
+import atexit
 import logging
-import json
+import orjson
 from datetime import datetime
+import io
+import itertools
 import os
-from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler
-from flask import Flask, request, g
-import threading
-from typing import Dict, Any
+from collections import OrderedDict
+import queue
+import stat
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from flask import Flask, request, g, jsonify
+from werkzeug.wrappers import Request
+from typing import Any, NamedTuple, Optional
 import sys
+import threading
+import time
+
+# Records waiting for the listener thread; beyond this they are dropped
+LOG_QUEUE_SIZE = 100000
+# Successful responses are logged one in this many; errors and slow requests always are
+RESPONSE_LOG_SAMPLE = 100
+SLOW_REQUEST_SECONDS = 0.1
+# Requests the middleware does not log: the static simulate form and static files
+UNLOGGED_PATHS = frozenset(['/api/meter/simulate'])
+UNLOGGED_PREFIX = '/static/'
+# Log files are written through a large buffer that is flushed on this interval
+LOG_BUFFER_SIZE = 64 * 1024
+LOG_FLUSH_INTERVAL = 0.1  # seconds
+
+_ts_cache = (0, '')  # (epoch milliseconds, formatted timestamp), swapped as one tuple
+
+def _fast_iso_ts() -> str:
+    """Local ISO timestamp to the millisecond, formatted once per millisecond"""
+    global _ts_cache
+    now = time.time()
+    ms = int(now * 1000)
+    cached_ms, text = _ts_cache
+    if ms != cached_ms:
+        text = datetime.fromtimestamp(now).isoformat(timespec='milliseconds')
+        _ts_cache = (ms, text)
+    return text
+
+class RequestEvent(NamedTuple):
+    method: str
+    path: str
+    ip: Optional[str]
+    content_length: Optional[str]
+    headers: Any = None  # Only captured when payload logging is on
+    body: Optional[str] = None
+
+class MeterEvent(NamedTuple):
+    meter_id: str
+    reading: float
+    status: str
+
+class ErrorEvent(NamedTuple):
+    type: str
+    message: str
+    exc_info: Any = None  # (type, value, traceback); formatted on the listener thread
+    stack_trace: Optional[str] = None
+
+class SystemEvent(NamedTuple):
+    type: str
+    message: str
+    details: Any = None
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full.
+
+    The queue is a SimpleQueue and handle() skips the handler lock, so producers
+    never wait on each other here. The LOG_QUEUE_SIZE bound is checked with qsize()
+    and may be overshot by a few records when producers race; dropped is likewise
+    an approximate count.
+    """
+    def __init__(self, log_queue: queue.SimpleQueue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def handle(self, record: logging.LogRecord):
+        # Handler.handle runs emit under the handler's RLock, which would serialize every
+        # thread logging through this one shared handler
+        rv = self.filter(record)
+        if isinstance(rv, logging.LogRecord):
+            record = rv
+        if rv:
+            self.emit(record)
+        return rv
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stdlib version formats the record, traceback included, on the caller's thread;
+        # the listener is in-process, so hand the record over as is and format it there
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        if self.queue.qsize() >= LOG_QUEUE_SIZE:
+            self.dropped += 1
+        else:
+            self.queue.put_nowait(record)
+
+class JsonErrorFormatter(logging.Formatter):
+    """Formats error records as JSON, rendering the traceback on the listener thread.
+
+    Repeats of the same exception at the same place reuse the formatted traceback.
+    """
+    CACHE_SIZE = 128
+
+    def __init__(self, fmt: str):
+        super().__init__(fmt)
+        self._traces = OrderedDict()
+
+    def _format_trace(self, exc_info) -> str:
+        exc_type, exc, tb = exc_info
+        frames = []
+        while tb is not None:
+            frames.append((tb.tb_frame.f_code, tb.tb_lineno))
+            tb = tb.tb_next
+        key = (exc_type, str(exc), tuple(frames))
+        trace = self._traces.get(key)
+        if trace is None:
+            trace = self._traces[key] = self.formatException(exc_info)
+            if len(self._traces) > self.CACHE_SIZE:
+                self._traces.popitem(last=False)
+        else:
+            self._traces.move_to_end(key)
+        return trace
+
+    def format(self, record: logging.LogRecord) -> str:
+        error = getattr(record, 'error', None) or ErrorEvent(None, record.getMessage())
+        record.message = orjson.dumps({
+            'timestamp': getattr(record, 'error_timestamp', None),
+            'error_type': error.type,
+            'message': error.message,
+            'stack_trace': self._format_trace(record.exc_info) if record.exc_info else error.stack_trace
+        }).decode()
+        record.asctime = self.formatTime(record, self.datefmt)
+        return self.formatMessage(record)
+
+class BufferedFileMixin:
+    """Keep a file handler's records in a large buffer instead of flushing after each one.
+
+    Rotation and close still flush, since both close the stream; everything else
+    is written out by flush_buffer(). Size-based rotation counts the bytes written
+    instead of seeking to the end of the file, which would flush the buffer too.
+    """
+    _carry = 0  # Bytes of the record that triggered a rollover, written to the new file
+
+    def _open(self):
+        stream = open(self.baseFilename, self.mode, buffering=LOG_BUFFER_SIZE,
+                      encoding=self.encoding, errors=self.errors)
+        st = os.fstat(stream.fileno())
+        # Only regular files rotate; None marks anything else
+        self._size = st.st_size + self._carry if stat.S_ISREG(st.st_mode) else None
+        self._carry = 0
+        return stream
+
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if not getattr(self, 'maxBytes', 0):
+            return super().shouldRollover(record)
+        if self.stream is None:
+            self.stream = self._open()
+        if self._size is None:
+            return False
+        size = len(f"{self.format(record)}{self.terminator}".encode(self.encoding or 'utf-8'))
+        if self._size + size >= self.maxBytes:
+            self._carry = size
+            return True
+        self._size += size
+        return False
+
+    def flush(self):
+        # Called by StreamHandler.emit after every record; deliberately a no-op
+        pass
+
+    def flush_buffer(self):
+        super().flush()
+
+class BufferedRotatingFileHandler(BufferedFileMixin, RotatingFileHandler):
+    pass
+
+class BufferedTimedRotatingFileHandler(BufferedFileMixin, TimedRotatingFileHandler):
+    pass
 
 class MeterLoggingSystem:
     def __init__(self, log_directory: str = "logs"):
         self.log_directory = log_directory
         self.setup_log_directory()
         self.setup_loggers()
-        self.lock = threading.Lock()
 
     def setup_log_directory(self):
         """Create necessary log directories if they don't exist"""
@@ -29,11 +201,18 @@ class MeterLoggingSystem:
                 os.makedirs(directory)
 
     def setup_loggers(self):
-        """Setup different loggers for different purposes"""
+        """Setup different loggers for different purposes
+
+        Callers only enqueue records; a single listener thread formats them and
+        writes to the file handlers, each of which filters for its own logger.
+        """
+        self._log_queue = queue.SimpleQueue()
+        self._queue_handler = DroppingQueueHandler(self._log_queue)
+
         # Request Logger
         self.request_logger = logging.getLogger('request_logger')
         self.request_logger.setLevel(logging.INFO)
-        request_handler = TimedRotatingFileHandler(
+        request_handler = BufferedTimedRotatingFileHandler(
             f"{self.log_directory}/requests/requests.log",
             when="midnight",
             interval=1,
@@ -42,12 +221,12 @@ class MeterLoggingSystem:
         request_handler.setFormatter(logging.Formatter(
             '%(asctime)s - %(levelname)s - %(message)s'
         ))
-        self.request_logger.addHandler(request_handler)
+        request_handler.addFilter(logging.Filter('request_logger'))
 
         # Meter Reading Logger
         self.meter_logger = logging.getLogger('meter_logger')
         self.meter_logger.setLevel(logging.INFO)
-        meter_handler = RotatingFileHandler(
+        meter_handler = BufferedRotatingFileHandler(
             f"{self.log_directory}/meter_readings/readings.log",
             maxBytes=10000000,  # 10MB
             backupCount=10
@@ -55,25 +234,25 @@ class MeterLoggingSystem:
         meter_handler.setFormatter(logging.Formatter(
             '%(asctime)s - %(levelname)s - %(message)s'
         ))
-        self.meter_logger.addHandler(meter_handler)
+        meter_handler.addFilter(logging.Filter('meter_logger'))
 
         # Error Logger
         self.error_logger = logging.getLogger('error_logger')
         self.error_logger.setLevel(logging.ERROR)
-        error_handler = RotatingFileHandler(
+        error_handler = BufferedRotatingFileHandler(
             f"{self.log_directory}/errors/errors.log",
             maxBytes=10000000,  # 10MB
             backupCount=10
         )
-        error_handler.setFormatter(logging.Formatter(
-            '%(asctime)s - %(levelname)s - %(message)s\n%(pathname)s:%(lineno)d\n%(message)s\n'
+        error_handler.setFormatter(JsonErrorFormatter(
+            '%(asctime)s - %(levelname)s - %(message)s'
         ))
-        self.error_logger.addHandler(error_handler)
+        error_handler.addFilter(logging.Filter('error_logger'))
 
         # System Logger
         self.system_logger = logging.getLogger('system_logger')
         self.system_logger.setLevel(logging.INFO)
-        system_handler = TimedRotatingFileHandler(
+        system_handler = BufferedTimedRotatingFileHandler(
             f"{self.log_directory}/system/system.log",
             when="midnight",
             interval=1,
@@ -82,110 +261,150 @@ class MeterLoggingSystem:
         system_handler.setFormatter(logging.Formatter(
             '%(asctime)s - %(levelname)s - %(message)s'
         ))
-        self.system_logger.addHandler(system_handler)
-
-    def log_request(self, request_data: Dict[str, Any]):
-        """Log incoming API requests"""
-        with self.lock:
-            self.request_logger.info(json.dumps({
-                'timestamp': datetime.now().isoformat(),
-                'method': request_data.get('method'),
-                'path': request_data.get('path'),
-                'headers': dict(request_data.get('headers', {})),
-                'body': request_data.get('body'),
-                'ip': request_data.get('ip')
-            }))
-
-    def log_meter_reading(self, meter_data: Dict[str, Any]):
+        system_handler.addFilter(logging.Filter('system_logger'))
+
+        for logger in (self.request_logger, self.meter_logger, self.error_logger, self.system_logger):
+            logger.addHandler(self._queue_handler)
+            logger.propagate = False
+
+        self._file_handlers = (request_handler, meter_handler, error_handler, system_handler)
+        self._listener = QueueListener(self._log_queue, *self._file_handlers, respect_handler_level=True)
+        self._listener.start()
+
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    def _flush_loop(self):
+        """Write buffered log records to disk every LOG_FLUSH_INTERVAL"""
+        while not self._closed.wait(LOG_FLUSH_INTERVAL):
+            for handler in self._file_handlers:
+                handler.flush_buffer()
+
+    def close(self):
+        """Write out queued records and close the log files"""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._listener.stop()
+        self._flusher.join()
+        for handler in self._file_handlers:
+            handler.close()
+
+    def log_request(self, event: RequestEvent):
+        """Log incoming API requests; headers and body only when they were captured"""
+        entry = {
+            'timestamp': _fast_iso_ts(),
+            'method': event.method,
+            'path': event.path,
+            'ip': event.ip,
+            'content_length': event.content_length
+        }
+        if event.headers is not None:
+            entry['headers'] = dict(event.headers)
+            entry['body'] = event.body
+        self.request_logger.info(orjson.dumps(entry).decode())
+
+    def log_meter_reading(self, event: MeterEvent):
         """Log meter readings"""
-        with self.lock:
-            self.meter_logger.info(json.dumps({
-                'timestamp': datetime.now().isoformat(),
-                'meter_id': meter_data.get('meter_id'),
-                'reading': meter_data.get('reading'),
-                'status': meter_data.get('status')
-            }))
-
-    def log_error(self, error_data: Dict[str, Any]):
-        """Log errors"""
-        with self.lock:
-            self.error_logger.error(json.dumps({
-                'timestamp': datetime.now().isoformat(),
-                'error_type': error_data.get('type'),
-                'message': error_data.get('message'),
-                'stack_trace': error_data.get('stack_trace')
-            }))
-
-    def log_system_event(self, event_data: Dict[str, Any]):
+        if not self.meter_logger.isEnabledFor(logging.INFO):
+            return
+        self.meter_logger.info(orjson.dumps({
+            'timestamp': _fast_iso_ts(),
+            'meter_id': event.meter_id,
+            'reading': event.reading,
+            'status': event.status
+        }).decode())
+
+    def log_error(self, event: ErrorEvent):
+        """Log errors; pass exc_info to have the traceback formatted off the request thread"""
+        self.error_logger.error('meter_error', exc_info=event.exc_info, extra={
+            'error': event,
+            'error_timestamp': _fast_iso_ts()
+        })
+
+    def log_system_event(self, event: SystemEvent):
         """Log system events"""
-        with self.lock:
-            self.system_logger.info(json.dumps({
-                'timestamp': datetime.now().isoformat(),
-                'event_type': event_data.get('type'),
-                'message': event_data.get('message'),
-                'details': event_data.get('details')
-            }))
+        self.system_logger.info(orjson.dumps({
+            'timestamp': _fast_iso_ts(),
+            'event_type': event.type,
+            'message': event.message,
+            'details': event.details
+        }).decode())
 
 class RequestLoggerMiddleware:
-    def __init__(self, app: Flask, logger: MeterLoggingSystem):
+    def __init__(self, app: Flask, logger: MeterLoggingSystem, log_payloads: bool = False):
         self.app = app
         self.logger = logger
+        self.log_payloads = log_payloads  # Debug only: also capture headers and body
+        self._counter = itertools.count()
 
     def __call__(self, environ, start_response):
         """WSGI middleware to log all requests"""
-        request = Request(environ)
-        
-        # Log request before processing
-        self.logger.log_request({
-            'method': request.method,
-            'path': request.path,
-            'headers': dict(request.headers),
-            'body': request.get_data(as_text=True),
-            'ip': request.remote_addr
-        })
+        path = environ.get('PATH_INFO', '')
+        if path in UNLOGGED_PATHS or path.startswith(UNLOGGED_PREFIX):
+            return self.app(environ, start_response)
+
+        # Log request before processing, straight from the WSGI environ; the body is
+        # represented by its Content-Length unless payload logging is on
+        event = RequestEvent(
+            environ.get('REQUEST_METHOD'),
+            path,
+            environ.get('REMOTE_ADDR'),
+            environ.get('CONTENT_LENGTH')
+        )
+        if self.log_payloads:
+            request = Request(environ)
+            body = request.get_data()
+            # Reading the body drains the input stream; put it back for the app
+            environ['wsgi.input'] = io.BytesIO(body)
+            event = event._replace(headers=request.headers, body=body.decode('utf-8', 'replace'))
+        self.logger.log_request(event)
 
         def custom_start_response(status, headers, exc_info=None):
-            # Log response after processing
-            self.logger.log_system_event({
-                'type': 'response',
-                'message': f'Response sent with status {status}',
-                'details': {'status': status, 'headers': dict(headers)}
-            })
+            # Log a sample of responses, plus every error response
+            if int(status[:3]) >= 400 or next(self._counter) % RESPONSE_LOG_SAMPLE == 0:
+                self.logger.log_system_event(SystemEvent(
+                    'response',
+                    f'Response sent with status {status}',
+                    {'status': status, 'headers': dict(headers)}
+                ))
             return start_response(status, headers, exc_info)
 
         return self.app(environ, custom_start_response)
 
 # Example usage with the meter reading API:
-def setup_logging_for_meter_api(app: Flask):
+def setup_logging_for_meter_api(app: Flask, log_payloads: bool = False):
     logger = MeterLoggingSystem()
-    app.wsgi_app = RequestLoggerMiddleware(app.wsgi_app, logger)
+    app.wsgi_app = RequestLoggerMiddleware(app.wsgi_app, logger, log_payloads)
     
     @app.before_request
     def before_request():
-        g.start_time = datetime.now()
+        g.start_time = time.perf_counter()
+        # Parse a JSON body once here so handlers can reuse it from g
+        if request.is_json:
+            g.parsed_body = request.get_json(silent=True)
 
     @app.after_request
     def after_request(response):
         if hasattr(g, 'start_time'):
-            elapsed = datetime.now() - g.start_time
-            logger.log_system_event({
-                'type': 'request_completed',
-                'message': f'Request processed in {elapsed.total_seconds()}s',
-                'details': {
-                    'path': request.path,
-                    'method': request.method,
-                    'status_code': response.status_code
-                }
-            })
+            elapsed = time.perf_counter() - g.start_time
+            if elapsed > SLOW_REQUEST_SECONDS or response.status_code >= 400:
+                logger.log_system_event(SystemEvent(
+                    'request_completed',
+                    f'Request processed in {elapsed}s',
+                    {
+                        'path': request.path,
+                        'method': request.method,
+                        'status_code': response.status_code
+                    }
+                ))
         return response
 
     @app.errorhandler(Exception)
     def handle_exception(e):
-        logger.log_error({
-            'type': type(e).__name__,
-            'message': str(e),
-            'stack_trace': traceback.format_exc()
-        })
+        logger.log_error(ErrorEvent(type(e).__name__, str(e), (type(e), e, e.__traceback__)))
         return jsonify({'error': 'Internal Server Error'}), 500
 
     return logger
@@ -201,19 +420,11 @@ if __name__ == '__main__':
         try:
             data = request.get_json()
             # Log the meter reading
-            logger.log_meter_reading({
-                'meter_id': data.get('meter_id'),
-                'reading': data.get('reading'),
-                'status': 'received'
-            })
+            logger.log_meter_reading(MeterEvent(data.get('meter_id'), data.get('reading'), 'received'))
             # Process the reading...
             return jsonify({'success': True})
         except Exception as e:
-            logger.log_error({
-                'type': type(e).__name__,
-                'message': str(e),
-                'stack_trace': traceback.format_exc()
-            })
+            logger.log_error(ErrorEvent(type(e).__name__, str(e), (type(e), e, e.__traceback__)))
             raise
             '''
 '''
@@ -1,18 +1,52 @@
-from flask import Flask, request, jsonify
-from datetime import datetime
-import re
-import json
-import logging
+from flask import Flask, Response, g, request, jsonify
+from flask.json.provider import JSONProvider
+from datetime import datetime, timedelta
+from collections import defaultdict
 from typing import Dict, List
+import importlib.util
+import numpy as np
+import orjson
+import os
+import sys
 import threading
 import time
 
-# Configure logging
-logging.basicConfig(
-    filename='meter_readings.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+# meter-logging-system.py has hyphens in its name, so it is loaded from its path
+_logging_spec = importlib.util.spec_from_file_location(
+    "meter_logging_system",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "meter-logging-system.py")
 )
+meter_logging_system = importlib.util.module_from_spec(_logging_spec)
+sys.modules[_logging_spec.name] = meter_logging_system
+_logging_spec.loader.exec_module(meter_logging_system)
+setup_logging_for_meter_api = meter_logging_system.setup_logging_for_meter_api
+MeterEvent = meter_logging_system.MeterEvent
+ErrorEvent = meter_logging_system.ErrorEvent
+
+# Readings kept in memory per meter: 48 hours at one reading every minute
+MAX_READINGS_PER_METER = 2880
+
+# Writers for different meters only contend when they hash to the same shard
+LOCK_SHARDS = 64
+
+def _to_ns(ts: datetime) -> int:
+    return int(ts.timestamp()) * 1_000_000_000 + ts.microsecond * 1000
+
+def _from_ns(ts_ns: int) -> datetime:
+    seconds, ns = divmod(ts_ns, 1_000_000_000)
+    return datetime.fromtimestamp(seconds).replace(microsecond=ns // 1000)
+
+class OrjsonProvider(JSONProvider):
+    """Flask JSON provider backed by orjson; jsonify() bodies are encoded straight to bytes"""
+    def dumps(self, obj, **kwargs) -> str:
+        return orjson.dumps(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype='application/json')
 
 class MeterReading:
     def __init__(self, meter_id: str, reading: float, timestamp: datetime):
@@ -27,15 +61,69 @@ class MeterReading:
             'timestamp': self.timestamp.isoformat()
         }
 
+class ReadingBuffer:
+    """A meter's most recent readings as parallel numpy arrays, oldest first.
+    
+    Timestamps are int64 nanoseconds since the epoch and values float64 kWh. The
+    arrays grow by doubling up to twice MAX_READINGS_PER_METER; once full, the
+    live window is moved back to the front, so eviction stays amortised O(1) and
+    the timestamps stay sorted for searchsorted.
+    """
+    __slots__ = ('_ts', '_val', '_start', '_end')
+    
+    def __init__(self, capacity: int = 64):
+        self._ts = np.empty(capacity, dtype=np.int64)
+        self._val = np.empty(capacity, dtype=np.float64)
+        self._start = 0
+        self._end = 0
+    
+    def append(self, ts_ns: int, value: float):
+        if self._end == len(self._ts):
+            if self._end < 2 * MAX_READINGS_PER_METER:
+                capacity = min(2 * self._end, 2 * MAX_READINGS_PER_METER)
+                self._ts = np.resize(self._ts, capacity)
+                self._val = np.resize(self._val, capacity)
+            else:
+                live = self._end - self._start
+                self._ts[:live] = self._ts[self._start:self._end]
+                self._val[:live] = self._val[self._start:self._end]
+                self._start, self._end = 0, live
+        self._ts[self._end] = ts_ns
+        self._val[self._end] = value
+        self._end += 1
+        if self._end - self._start > MAX_READINGS_PER_METER:
+            self._start += 1
+    
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._ts[self._start:self._end]
+    
+    @property
+    def values(self) -> np.ndarray:
+        return self._val[self._start:self._end]
+    
+    def __len__(self) -> int:
+        return self._end - self._start
+
 class MeterReadingSystem:
-    def __init__(self):
-        self.readings: Dict[str, List[MeterReading]] = {}
-        self.lock = threading.Lock()
+    def __init__(self, logger):
+        self.logger = logger  # MeterLoggingSystem; readings go to its queued meter log
+        self.readings: Dict[str, ReadingBuffer] = defaultdict(ReadingBuffer)
+        self._locks = [threading.Lock() for _ in range(LOCK_SHARDS)]
+
+    def _lock_for(self, meter_id: str) -> threading.Lock:
+        return self._locks[hash(meter_id) & (LOCK_SHARDS - 1)]
 
     def validate_meter_id(self, meter_id: str) -> bool:
         """Validate meter ID format (999-999-999)"""
-        pattern = r'^\d{3}-\d{3}-\d{3}$'
-        return bool(re.match(pattern, meter_id))
+        # Fixed shape: 11 ASCII characters, dashes at 3 and 7, digits everywhere else
+        return (
+            len(meter_id) == 11
+            and meter_id[3] == '-'
+            and meter_id[7] == '-'
+            and meter_id.isascii()
+            and meter_id.replace('-', '', 2).isdigit()
+        )
 
     def validate_reading(self, reading: float) -> bool:
         """Validate reading format (99999.9)"""
@@ -48,84 +136,37 @@ class MeterReadingSystem:
         if not self.validate_reading(reading):
             return False, "Invalid reading. Must be between 0 and 99999.9"
 
-        with self.lock:
-            new_reading = MeterReading(meter_id, reading, datetime.now())
-            if meter_id not in self.readings:
-                self.readings[meter_id] = []
-            self.readings[meter_id].append(new_reading)
-            
-            # Log the reading
-            logging.info(f"New reading added: {new_reading.to_dict()}")
-            
-            return True, "Reading added successfully"
+        with self._lock_for(meter_id):
+            self.readings[meter_id].append(time.time_ns(), reading)
+
+        self.logger.log_meter_reading(MeterEvent(meter_id, reading, 'added'))
+        return True, "Reading added successfully"
 
     def get_latest_reading(self, meter_id: str) -> Dict:
         if meter_id not in self.readings:
             return None
-        return self.readings[meter_id][-1].to_dict()
+        with self._lock_for(meter_id):
+            buffer = self.readings[meter_id]
+            ts_ns, value = int(buffer.timestamps[-1]), float(buffer.values[-1])
+        return MeterReading(meter_id, value, _from_ns(ts_ns)).to_dict()
 
     def get_readings_by_date(self, meter_id: str, date: datetime) -> List[Dict]:
         if meter_id not in self.readings:
             return []
+        day_start = date.replace(hour=0, minute=0, second=0, microsecond=0)
+        bounds = [_to_ns(day_start), _to_ns(day_start + timedelta(days=1))]
+        with self._lock_for(meter_id):
+            buffer = self.readings[meter_id]
+            lo, hi = np.searchsorted(buffer.timestamps, bounds)
+            timestamps = buffer.timestamps[lo:hi].tolist()
+            values = buffer.values[lo:hi].tolist()
         return [
-            reading.to_dict() 
-            for reading in self.readings[meter_id] 
-            if reading.timestamp.date() == date.date()
+            MeterReading(meter_id, value, _from_ns(ts_ns)).to_dict()
+            for ts_ns, value in zip(timestamps, values)
         ]
 
-app = Flask(__name__)
-meter_system = MeterReadingSystem()
-logger = setup_logging_for_meter_api(app)
-
-@app.route('/api/meter/reading', methods=['POST'])
-def submit_reading():
-    try:
-        data = request.get_json()
-        
-        if not data or 'meter_id' not in data or 'reading' not in data:
-            logger.log_error({
-                'type': 'ValidationError',
-                'message': 'Missing required fields',
-                'details': {'received_data': data}
-            })
-            return jsonify({
-                'success': False,
-                'error': 'Missing required fields'
-            }), 400
-
-    success, message = meter_system.add_reading(
-        data['meter_id'],
-        float(data['reading'])
-    )
-
-    if success:
-        return jsonify({
-            'success': True,
-            'message': message
-        })
-    else:
-        return jsonify({
-            'success': False,
-            'error': message
-        }), 400
-
-@app.route('/api/meter/reading/<meter_id>', methods=['GET'])
-def get_reading(meter_id):
-    reading = meter_system.get_latest_reading(meter_id)
-    if reading:
-        return jsonify({
-            'success': True,
-            'data': reading
-        })
-    return jsonify({
-        'success': False,
-        'error': 'No readings found for this meter'
-    }), 404
-
-@app.route('/api/meter/simulate', methods=['GET'])
-def simulate_reading():
-    """Endpoint to simulate a meter reading input form"""
-    return '''
+# Static page served by /api/meter/simulate, encoded once at import
+SIMULATE_FORM = r'''
         <html>
             <body>
                 <h2>Simulate Meter Reading</h2>
@@ -170,7 +211,64 @@ def simulate_reading():
                 </script>
             </body>
         </html>
-    '''
+    '''.encode('utf-8')
+
+app = Flask(__name__)
+app.json = OrjsonProvider(app)
+logger = setup_logging_for_meter_api(app)
+meter_system = MeterReadingSystem(logger)
+
+@app.route('/api/meter/reading', methods=['POST'])
+def submit_reading():
+    try:
+        # Parsed once in before_request; fall back for apps without the logging hooks
+        data = g.get('parsed_body') or request.get_json(silent=True)
+        
+        if not data or 'meter_id' not in data or 'reading' not in data:
+            logger.log_error(ErrorEvent('ValidationError', 'Missing required fields'))
+            return jsonify({
+                'success': False,
+                'error': 'Missing required fields'
+            }), 400
+
+        reading = float(data['reading'])
+    except (TypeError, ValueError) as e:
+        logger.log_error(ErrorEvent(type(e).__name__, str(e)))
+        return jsonify({
+            'success': False,
+            'error': 'Reading must be a number'
+        }), 400
+
+    success, message = meter_system.add_reading(data['meter_id'], reading)
+
+    if success:
+        return jsonify({
+            'success': True,
+            'message': message
+        })
+    else:
+        return jsonify({
+            'success': False,
+            'error': message
+        }), 400
+
+@app.route('/api/meter/reading/<meter_id>', methods=['GET'])
+def get_reading(meter_id):
+    reading = meter_system.get_latest_reading(meter_id)
+    if reading:
+        return jsonify({
+            'success': True,
+            'data': reading
+        })
+    return jsonify({
+        'success': False,
+        'error': 'No readings found for this meter'
+    }), 404
+
+@app.route('/api/meter/simulate', methods=['GET'])
+def simulate_reading():
+    """Endpoint to simulate a meter reading input form"""
+    return Response(SIMULATE_FORM, mimetype='text/html')
 
 if __name__ == '__main__':
     app.run(debug=True)
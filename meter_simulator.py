@@ -1,77 +1,132 @@
+import asyncio
 import threading
 import time
-import requests
+import aiohttp
+import json
 import random
+from collections import deque
 from datetime import datetime
 
+BULK_URL = 'http://127.0.0.1:8080/api/meter/readings/bulk'
+BATCH_SIZE = 32  # Send once this many readings are waiting...
+FLUSH_INTERVAL = 60  # ...or this many seconds have passed since the last send
+MAX_PENDING = 64  # Readings kept while the API is down; the oldest are dropped beyond this
+JSON_HEADERS = {'Content-Type': 'application/json'}
+
 class MeterSimulator:
     def __init__(self, meter_id, base_consumption=100.0):
         self.meter_id = meter_id
         self.current_reading = base_consumption
         self.running = False
-        self.thread = None
-
-    def start(self):
-        """Start the meter simulation"""
-        self.running = True
-        self.thread = threading.Thread(target=self._run_simulation)
-        self.thread.daemon = True
-        self.thread.start()
+        self._stop = None
+        self._batch = deque(maxlen=MAX_PENDING)  # Readings already encoded as JSON objects
+        # Only the reading and timestamp change between ticks, so the rest is encoded once
+        self._payload_prefix = b'{"meter_id":' + json.dumps(meter_id).encode() + b',"reading":'
+        self._last_flush = time.monotonic()
+        self._cached_hour = 0
+        self._next_hour_check = 0.0
 
     def stop(self):
-        """Stop the meter simulation"""
+        """Stop the meter simulation; call from the event loop"""
         self.running = False
-        if self.thread:
-            self.thread.join()
+        if self._stop is not None:
+            self._stop.set()
 
-    def _run_simulation(self):
+    async def _pause(self, seconds):
+        """Sleep for up to `seconds`, returning early when stopped"""
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self, session):
         """Simulate electricity meter readings"""
+        self.running = True
+        self._stop = asyncio.Event()
         while self.running:
-            current_hour = datetime.now().hour
-
-            # Only send readings between 01:00 and 23:59
-            if current_hour != 0:
+            now = time.time()
+            # The hour only needs rechecking once a minute
+            if now >= self._next_hour_check:
+                self._cached_hour = time.localtime(now).tm_hour
+                self._next_hour_check = now + 60
+
+            # Only take readings between 01:00 and 23:59
+            if self._cached_hour != 0:
                 self.current_reading += random.uniform(0.5, 2.0)
-
-                try:
-                    response = requests.post(
-                        'http://127.0.0.1:8080/api/meter/reading',
-                        json={
-                            'meter_id': self.meter_id,
-                            'reading': round(self.current_reading, 1),
-                            'timestamp': datetime.now().isoformat()
-                        },
-                        timeout=5  # Set timeout to prevent hanging requests
-                    )
-
-                    if response.status_code == 200:
-                        print(f"✅ Sent reading for {self.meter_id}: {self.current_reading:.1f} kWh")
-                    else:
-                        print(f"⚠️ Failed to send reading for {self.meter_id}: {response.text}")
-
-                except requests.exceptions.ConnectionError:
-                    print(f"❌ API is not running! Ensure `app.py` is started.")
-                    time.sleep(10)  # Wait before retrying
-                except Exception as e:
-                    print(f"❌ Error sending reading: {e}")
-
-            time.sleep(30)  # Use 1800 for production
+                self._batch.append(
+                    self._payload_prefix
+                    + b'%.1f,"timestamp":"%s"}' % (self.current_reading, datetime.fromtimestamp(now).isoformat().encode())
+                )
+
+            if self._batch and (
+                len(self._batch) >= BATCH_SIZE
+                or time.monotonic() - self._last_flush >= FLUSH_INTERVAL
+            ):
+                await self._flush(session)
+
+            await self._pause(30)  # Use 1800 for production
+
+        # Send whatever is left when stopped
+        if self._batch:
+            await self._flush(session)
+
+    async def _flush(self, session):
+        """Send the waiting readings in one request; keep them for the next try on failure"""
+        self._last_flush = time.monotonic()
+        try:
+            payload = b'[' + b','.join(self._batch) + b']'
+            async with session.post(BULK_URL, data=payload, headers=JSON_HEADERS) as response:
+                if response.status in (200, 202):
+                    print(f"✅ Sent {len(self._batch)} readings for {self.meter_id}: {self.current_reading:.1f} kWh")
+                    self._batch.clear()
+                else:
+                    print(f"⚠️ Failed to send readings for {self.meter_id}: {await response.text()}")
+
+        except aiohttp.ClientConnectionError:
+            print(f"❌ API is not running! Ensure `app.py` is started.")
+            await self._pause(10)  # Wait before retrying
+        except Exception as e:
+            print(f"❌ Error sending readings: {e}")
 
 class MeterSimulatorManager:
+    """Runs every simulated meter as a coroutine on one event loop in a background thread"""
     def __init__(self):
         self.simulators = {}
+        self._tasks = []
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        self._session = self._call(self._open_session())
+
+    def _call(self, coro):
+        """Run a coroutine on the simulator loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result()
+
+    async def _open_session(self):
+        # One pooled keep-alive session shared by every simulated meter
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100),
+            timeout=aiohttp.ClientTimeout(total=5)  # Set timeout to prevent hanging requests
+        )
 
     def add_meter(self, meter_id, base_consumption=100.0):
         """Add a new simulated meter"""
         if meter_id not in self.simulators:
             simulator = MeterSimulator(meter_id, base_consumption)
             self.simulators[meter_id] = simulator
-            simulator.start()
+            self._tasks.append(asyncio.run_coroutine_threadsafe(simulator.run(self._session), self._loop))
 
-    def stop_all(self):
-        """Stop all meter simulations"""
+    async def _stop_all(self):
         for simulator in self.simulators.values():
             simulator.stop()
+        await asyncio.gather(*(asyncio.wrap_future(task) for task in self._tasks), return_exceptions=True)
+        await self._session.close()
+
+    def stop_all(self):
+        """Stop all meter simulations"""
+        self._call(self._stop_all())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
 
 if __name__ == "__main__":
     manager = MeterSimulatorManager()